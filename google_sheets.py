@@ -2,17 +2,31 @@
 google_sheets.py
 """
 
+import functools
+import json
 import logging
+import os
+import threading
 import time
 import gspread
+from google.auth.exceptions import RefreshError
+from oauth2client.client import AccessTokenRefreshError
 from oauth2client.service_account import ServiceAccountCredentials
-from typing import Callable, Any, List, Tuple
+from typing import Callable, Any, Dict, List, Tuple
 import gspread.utils
 
+# Errors meaning the cached authorization is no longer usable
+AUTH_ERRORS = (RefreshError, AccessTokenRefreshError)
+
+@functools.lru_cache(maxsize=None)
 def setup_google_sheets(credentials_path: str, spreadsheet_url: str) -> gspread.Spreadsheet:
     """
     Set up Google Sheets connection with retry logic.
 
+    The connection is cached per (credentials_path, spreadsheet_url) so retries
+    skip re-reading the key file and re-authorizing; call
+    setup_google_sheets.cache_clear() after an authorization error.
+
     Args:
         credentials_path (str): Path to the JSON service account file.
         spreadsheet_url (str): Google Sheets URL.
@@ -28,9 +42,80 @@ def setup_google_sheets(credentials_path: str, spreadsheet_url: str) -> gspread.
         logging.info("Successfully connected to Google Sheets")
         return sheet
     except Exception as e:
-        logging.error(f"Error setting up Google Sheets: {str(e)}")
+        logging.error("Error setting up Google Sheets: %s", e)
         raise
 
+class TokenBucket:
+    """
+    Adaptive token bucket that paces requests against the Sheets API quota.
+
+    The refill rate is halved on every rate-limit error and grows back by 10%
+    after a run of consecutive successes once the last error is far enough in
+    the past, so sustained pressure slows callers down before more 429s pile up.
+    """
+
+    SUCCESSES_TO_RECOVER = 20
+    RECOVERY_COOLDOWN = 60  # seconds after a rate-limit error before the rate may grow
+    MIN_RATE = 1 / 300  # never wait more than 300 seconds for a token
+
+    def __init__(self, quota_per_minute: int):
+        """
+        Args:
+            quota_per_minute (int): Allowed requests per minute; also the burst capacity.
+        """
+        self.max_rate = quota_per_minute / 60
+        self.rate = self.max_rate
+        self.capacity = quota_per_minute
+        self.tokens = float(quota_per_minute)
+        self.last_refill = time.monotonic()
+        self.last_error = float('-inf')
+        self.successes = 0
+        self.lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def acquire(self, tokens: int = 1) -> None:
+        """Block until the requested number of tokens is available."""
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait_time = (tokens - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+    def on_success(self) -> None:
+        """Record a successful request and slowly restore the rate."""
+        with self.lock:
+            self.successes += 1
+            recently_throttled = time.monotonic() - self.last_error < self.RECOVERY_COOLDOWN
+            if self.successes >= self.SUCCESSES_TO_RECOVER and not recently_throttled:
+                self.rate = min(self.rate * 1.1, self.max_rate)
+                self.successes = 0
+
+    def on_throttle(self) -> float:
+        """
+        Record a rate-limit error: halve the rate and drop any saved-up burst.
+
+        Returns:
+            float: Seconds until the next token becomes available.
+        """
+        with self.lock:
+            self._refill()
+            self.rate = max(self.rate * 0.5, self.MIN_RATE)
+            self.tokens = 0.0
+            self.successes = 0
+            self.last_error = time.monotonic()
+            return 1 / self.rate
+
+# Shared by every Sheets API call (via sheets_retry) so that reads and writes draw from one budget
+SHEETS_QUOTA_PER_MINUTE = 60
+sheets_bucket = TokenBucket(SHEETS_QUOTA_PER_MINUTE)
+
 def exponential_retry(func: Callable, *args, **kwargs) -> Any:
     """
     Wrapper function to add exponential retry logic to any operation.
@@ -56,65 +141,186 @@ def exponential_retry(func: Callable, *args, **kwargs) -> Any:
             if "Quota exceeded" in error_message:
                 wait_time = min(current_delay, MAX_DELAY)
                 logging.warning(
-                    f"Rate limit hit on attempt {attempt}. Waiting {wait_time} seconds before retry..."
+                    "Rate limit hit on attempt %s. Waiting %s seconds before retry...",
+                    attempt, wait_time
                 )
                 time.sleep(wait_time)
                 current_delay = min(current_delay * 2, MAX_DELAY)
                 attempt += 1
             else:
-                logging.error(f"Unexpected error: {error_message}")
+                logging.error("Unexpected error: %s", error_message)
+                raise
+
+def sheets_retry(func: Callable, *args, **kwargs) -> Any:
+    """
+    Run a Google Sheets API call, paced by the shared Sheets token bucket.
+
+    Each attempt takes a token from sheets_bucket; on "Quota exceeded" the
+    bucket slows down and the call is retried once a token is available.
+    Only use this for calls that count against the Sheets quota.
+
+    Args:
+        func (Callable): The function to execute.
+        *args: Function arguments.
+        **kwargs: Function keyword arguments.
+
+    Returns:
+        Any: The return value of the function.
+    """
+    attempt = 1
+
+    while True:
+        sheets_bucket.acquire()
+        try:
+            result = func(*args, **kwargs)
+            sheets_bucket.on_success()
+            return result
+        except Exception as e:
+            error_message = str(e)
+            if "Quota exceeded" in error_message:
+                wait_time = sheets_bucket.on_throttle()
+                logging.warning(
+                    "Rate limit hit on attempt %s. Retrying in about %.1f seconds...",
+                    attempt, wait_time
+                )
+                attempt += 1
+            else:
+                logging.error("Unexpected error: %s", error_message)
                 raise
 
+def get_header_columns(worksheet: gspread.Worksheet, cache_path: str, refresh: bool = False) -> Dict[str, int]:
+    """
+    Map header names to 1-based column indices, using a cached copy when available.
+
+    Args:
+        worksheet (gspread.Worksheet): The worksheet whose first row holds the headers.
+        cache_path (str): Path of the JSON file used to cache the mapping.
+        refresh (bool): Ignore the cached copy and re-read the header row.
+
+    Returns:
+        Dict[str, int]: Header name to column index.
+    """
+    if not refresh and os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                columns = json.load(f)
+            logging.info("Loaded cached header columns from %s", cache_path)
+            return columns
+        except Exception as e:
+            logging.warning("Could not read header cache %s: %s", cache_path, e)
+
+    headers = sheets_retry(worksheet.row_values, 1)
+    columns = {}
+    for col, name in enumerate(headers, start=1):
+        # Keep the first column for repeated headers, as headers.index() did
+        if name and name not in columns:
+            columns[name] = col
+
+    cache_dir = os.path.dirname(cache_path)
+    if cache_dir and not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        json.dump(columns, f, ensure_ascii=False)
+    logging.info("Fetched %s header columns and cached them to %s", len(columns), cache_path)
+    return columns
+
+def get_columns_values(worksheet: gspread.Worksheet, cols: List[int]) -> List[List[str]]:
+    """
+    Read whole columns in a single values.batchGet request.
+
+    Each returned list starts with the header cell and is padded with empty
+    strings so that all columns have the same length.
+
+    Args:
+        worksheet (gspread.Worksheet): The worksheet to read.
+        cols (List[int]): 1-based column indices to read.
+
+    Returns:
+        List[List[str]]: One list of cell values per requested column.
+    """
+    ranges = []
+    for col in cols:
+        letter = gspread.utils.rowcol_to_a1(1, col)[:-1]
+        ranges.append(gspread.utils.absolute_range_name(worksheet.title, f"{letter}:{letter}"))
+
+    response = worksheet.spreadsheet.values_batch_get(
+        ranges, params={'majorDimension': 'COLUMNS'}
+    )
+    columns = [
+        (value_range.get('values') or [[]])[0]
+        for value_range in response.get('valueRanges', [])
+    ]
+
+    length = max((len(column) for column in columns), default=0)
+    return [column + [''] * (length - len(column)) for column in columns]
+
+def _coalesce_updates(updates: List[Tuple[int, int, str]]) -> List[dict]:
+    """
+    Merge (row, col, value) updates into A1 range blocks.
+
+    Consecutive rows in the same column are collapsed into a single
+    range, e.g. C2, C3, C4 become one 'C2:C4' entry.
+
+    Args:
+        updates (List[Tuple[int, int, str]]): List of (row, col, value) updates.
+
+    Returns:
+        List[dict]: Range entries suitable for worksheet.batch_update.
+    """
+    ranges = []
+    run_start = run_end = run_col = None
+    run_values = []
+
+    for row, col, value in sorted(updates, key=lambda u: (u[1], u[0])):
+        if col == run_col and row == run_end + 1:
+            run_end = row
+            run_values.append([value])
+            continue
+        if run_values:
+            ranges.append(_range_entry(run_start, run_end, run_col, run_values))
+        run_start = run_end = row
+        run_col = col
+        run_values = [[value]]
+
+    if run_values:
+        ranges.append(_range_entry(run_start, run_end, run_col, run_values))
+
+    return ranges
+
+def _range_entry(start_row: int, end_row: int, col: int, values: List[List[str]]) -> dict:
+    """Build a single batch_update range entry for one column run."""
+    start = gspread.utils.rowcol_to_a1(start_row, col)
+    end = gspread.utils.rowcol_to_a1(end_row, col)
+    return {
+        'range': start if start == end else f"{start}:{end}",
+        'values': values
+    }
+
 def batch_update_cells(worksheet: gspread.Worksheet, updates: List[Tuple[int, int, str]]) -> None:
     """
-    Perform batch updates on cells with exponential backoff.
+    Write all cell updates with a single values.batchUpdate request.
+
+    Contiguous cells in a column are sent as one range; the whole run counts
+    as one request against the Sheets quota and is retried as a unit.
 
     Args:
         worksheet (gspread.Worksheet): The worksheet to update.
         updates (List[Tuple[int, int, str]]): List of (row, col, value) updates.
     """
-    BATCH_SIZE = 10
-    BASE_DELAY = 2
-    MAX_DELAY = 300
+    logging.info("Starting batch updates for %s cells...", len(updates))
+
+    data = [
+        {
+            'range': gspread.utils.absolute_range_name(worksheet.title, entry['range']),
+            'values': entry['values']
+        }
+        for entry in _coalesce_updates(updates)
+    ]
+    logging.info("Coalesced %s cells into %s ranges", len(updates), len(data))
 
-    logging.info(f"Starting batch updates for {len(updates)} cells...")
-
-    batch_requests = []
-    for row, col, value in updates:
-        batch_requests.append({
-            'range': gspread.utils.rowcol_to_a1(row, col),
-            'values': [[value]]
-        })
-
-    total_batches = (len(batch_requests) + BATCH_SIZE - 1) // BATCH_SIZE
-    for i in range(0, len(batch_requests), BATCH_SIZE):
-        batch = batch_requests[i:i + BATCH_SIZE]
-        current_delay = BASE_DELAY
-        batch_success = False
-        attempt = 1
-        current_batch = i // BATCH_SIZE + 1
-
-        logging.info(f"Processing batch {current_batch}/{total_batches}")
-
-        while not batch_success:
-            try:
-                worksheet.batch_update(batch)
-                logging.info(f"Successfully updated batch {current_batch}/{total_batches}")
-                batch_success = True
-                time.sleep(BASE_DELAY)
-            except Exception as e:
-                error_message = str(e)
-                if "Quota exceeded" in error_message:
-                    wait_time = min(current_delay, MAX_DELAY)
-                    logging.warning(
-                        f"Rate limit hit on batch {current_batch}, attempt {attempt}. "
-                        f"Waiting {wait_time} seconds before retry..."
-                    )
-                    time.sleep(wait_time)
-                    current_delay = min(current_delay * 2, MAX_DELAY)
-                    attempt += 1
-                else:
-                    logging.error(f"Unexpected error during batch update: {error_message}")
-                    raise
+    sheets_retry(
+        worksheet.spreadsheet.values_batch_update,
+        {'valueInputOption': 'USER_ENTERED', 'data': data}
+    )
 
     logging.info("All batch updates completed successfully")
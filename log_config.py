@@ -2,23 +2,58 @@
 log_config.py
 """
 
+import atexit
 import logging
 import os
+import queue
 from datetime import datetime
+from logging.handlers import MemoryHandler, QueueHandler, QueueListener
+
+# Number of records buffered before they are written to the log file;
+# errors are written out immediately
+LOG_BUFFER_CAPACITY = 256
 
 def setup_logging() -> None:
-    """Set up logging configuration."""
+    """
+    Set up logging configuration.
+
+    Records are pushed onto an in-memory queue and written to the file and
+    console by a background listener, so logging threads never block on I/O.
+    """
     if not os.path.exists('logs'):
         os.makedirs('logs')
 
-    log_format = '%(asctime)s - %(levelname)s - %(message)s'
-    logging.basicConfig(
-        level=logging.INFO,
-        format=log_format,
-        handlers=[
-            logging.FileHandler(
-                f'logs/scraper_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log'
-            ),
-            logging.StreamHandler()
-        ]
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+
+    file_handler = logging.FileHandler(
+        f'logs/scraper_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log'
+    )
+    file_handler.setFormatter(formatter)
+    buffered_file_handler = MemoryHandler(
+        LOG_BUFFER_CAPACITY,
+        flushLevel=logging.ERROR,
+        target=file_handler
+    )
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(-1)
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    root_logger.addHandler(QueueHandler(log_queue))
+
+    listener = QueueListener(
+        log_queue,
+        buffered_file_handler,
+        stream_handler,
+        respect_handler_level=True
     )
+    listener.start()
+
+    def stop_listener() -> None:
+        listener.stop()
+        buffered_file_handler.close()
+        file_handler.close()
+
+    atexit.register(stop_listener)
@@ -7,6 +7,7 @@ import time
 
 from log_config import setup_logging
 from price_stock_manager import PriceStockManager
+from google_sheets import AUTH_ERRORS, setup_google_sheets
 from config import (
     CREDENTIALS_PATH,
     SPREADSHEET_URL,
@@ -19,22 +20,29 @@ from config import (
 def main():
     setup_logging()
     logging.info("Starting price and stock update script")
-    logging.info(f"Target spreadsheet: {SPREADSHEET_URL}")
+    logging.info("Target spreadsheet: %s", SPREADSHEET_URL)
 
+    manager = None
     for attempt in range(MAX_RETRIES):
         try:
-            logging.info(f"Attempt {attempt + 1}/{MAX_RETRIES}")
-            manager = PriceStockManager(CREDENTIALS_PATH, SPREADSHEET_URL, TELEGRAM_BOT_TOKEN, USER_CATEGORIES)
+            logging.info("Attempt %s/%s", attempt + 1, MAX_RETRIES)
+            if manager is None:
+                manager = PriceStockManager(CREDENTIALS_PATH, SPREADSHEET_URL, TELEGRAM_BOT_TOKEN, USER_CATEGORIES)
             manager.update_prices_and_stock()
             logging.info("Script completed successfully")
             break
         except Exception as e:
+            if isinstance(e, AUTH_ERRORS):
+                # Drop the cached connection so the next attempt re-authorizes
+                logging.warning("Google authorization failed, reconnecting on next attempt")
+                setup_google_sheets.cache_clear()
+                manager = None
             if attempt < MAX_RETRIES - 1:
-                logging.error(f"Attempt {attempt + 1} failed: {str(e)}")
-                logging.info(f"Retrying in {RETRY_DELAY} seconds...")
+                logging.error("Attempt %s failed: %s", attempt + 1, e)
+                logging.info("Retrying in %s seconds...", RETRY_DELAY)
                 time.sleep(RETRY_DELAY)
             else:
-                logging.error(f"All attempts failed. Last error: {str(e)}")
+                logging.error("All attempts failed. Last error: %s", e)
                 raise
 
 if __name__ == "__main__":
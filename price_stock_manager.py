@@ -8,8 +8,11 @@ using data from ShopA and ShopB, and sends Telegram notifications as needed.
 import logging
 import time
 import math
-from typing import Dict, List, Tuple
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
 import requests
+import requests_cache
 from datetime import datetime
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
@@ -17,10 +20,76 @@ import random
 
 import gspread
 
-from .telegram_notifier import TelegramNotificationService
-from .shop_a_scraper import extract_shopA_info
-from .shop_b_scraper import extract_price_from_shopB
-from .google_sheets import setup_google_sheets, exponential_retry, batch_update_cells
+from telegram_notifier import TelegramNotificationService
+from shop_a_scraper import SHOP_A_BASE_URL, extract_shopA_info
+from shop_b_scraper import extract_price_from_shopB
+from google_sheets import (
+    setup_google_sheets,
+    exponential_retry,
+    sheets_retry,
+    batch_update_cells,
+    get_header_columns,
+    get_columns_values
+)
+
+# Scraping is I/O-bound, so threads overlap network waits and politeness delays
+MAX_WORKERS = 16
+
+# Upper bound on in-flight requests to each shop, independent of MAX_WORKERS
+MAX_CONCURRENT_PER_SHOP = 8
+
+# Minimum spacing between ShopB requests; random jitter is added on top
+# while ShopB has recently answered with 403/429
+SHOP_B_MIN_INTERVAL = 1.0  # seconds
+SHOP_B_THROTTLE_WINDOW = 60  # seconds
+
+# Header row of Sheet2 is cached here so regular runs skip fetching it
+HEADER_CACHE_PATH = 'cache/sheet2_headers.json'
+
+# On-disk cache of ShopA/ShopB responses, reused across runs
+HTTP_CACHE_PATH = 'cache/http_cache'
+HTTP_CACHE_EXPIRE_AFTER = 600  # seconds
+
+# Columns read from Sheet2
+READ_COLUMNS = ("ShopA_ID", "Category", "ShopB_Link", "Title", "Name")
+
+# Columns written back to Sheet2; their previous values are read as well
+WRITE_COLUMNS = ("ShopB_Price", "ShopA_Price", "ShopA_Stock")
+
+class PacedHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that waits for its turn before every request sent over the network.
+
+    Responses served from the requests-cache store never reach the adapter,
+    so cache hits are not delayed.
+    """
+
+    def __init__(self, wait: Callable[[], None], **kwargs: Any):
+        self._wait = wait
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        self._wait()
+        return super().send(request, **kwargs)
+
+def _needs_update(old: str, new: Any) -> bool:
+    """
+    Check whether a scraped value differs from what the sheet already holds.
+
+    Both sides are normalized to integers so that "1,200" matches 1200.0
+    and "0.0" matches 0.
+
+    Args:
+        old (str): Current cell value as read from the sheet.
+        new (Any): Newly scraped value.
+
+    Returns:
+        bool: True if the cell should be written.
+    """
+    try:
+        return str(int(float(old.replace(',', '')))) != str(int(float(new)))
+    except (TypeError, ValueError, OverflowError):
+        return True
 
 class PriceStockManager:
     def __init__(
@@ -33,6 +102,10 @@ class PriceStockManager:
         logging.info("Initializing PriceStockManager...")
         self.credentials_path = credentials_path
         self.spreadsheet_url = spreadsheet_url
+        self._shop_a_slots = threading.BoundedSemaphore(MAX_CONCURRENT_PER_SHOP)
+        self._shop_b_lock = threading.Lock()
+        self._last_shop_b_ts = 0.0
+        self._shop_b_throttled_ts = float('-inf')
         logging.info("Creating requests session...")
         self.session = self._create_session()
         logging.info("Setting up Google Sheets connection...")
@@ -41,12 +114,20 @@ class PriceStockManager:
         self.telegram = TelegramNotificationService(telegram_bot_token, user_categories)
         logging.info("PriceStockManager initialization complete")
 
-    def _create_session(self) -> requests.Session:
+    def _create_session(self) -> requests_cache.CachedSession:
         """
-        Create a requests session with retry logic.
+        Create a cached requests session with retry logic.
+
+        Responses are stored in a SQLite cache and revalidated according to
+        the servers' Cache-Control/ETag headers.
         """
         logging.info("Configuring requests session...")
-        session = requests.Session()
+        session = requests_cache.CachedSession(
+            HTTP_CACHE_PATH,
+            backend='sqlite',
+            expire_after=HTTP_CACHE_EXPIRE_AFTER,
+            cache_control=True
+        )
 
         retries = Retry(
             total=5,
@@ -54,14 +135,24 @@ class PriceStockManager:
             status_forcelist=[500, 502, 503, 504, 404]
         )
 
-        adapter = HTTPAdapter(
+        # Each adapter's pool is sized to the requests that may be in flight
+        # to its shop, so every connection is kept alive and reused
+        shop_a_adapter = HTTPAdapter(
+            max_retries=retries,
+            pool_maxsize=MAX_CONCURRENT_PER_SHOP
+        )
+
+        # ShopB links come from the sheet, so every other host is treated as ShopB
+        # and paced; only requests that miss the cache reach the adapter
+        shop_b_adapter = PacedHTTPAdapter(
+            self._wait_for_shop_b,
             max_retries=retries,
-            pool_connections=10,
-            pool_maxsize=10
+            pool_maxsize=MAX_CONCURRENT_PER_SHOP
         )
 
-        session.mount('http://', adapter)
-        session.mount('https://', adapter)
+        session.mount('http://', shop_b_adapter)
+        session.mount('https://', shop_b_adapter)
+        session.mount(SHOP_A_BASE_URL, shop_a_adapter)
 
         session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
@@ -73,6 +164,22 @@ class PriceStockManager:
         logging.info("Requests session configured successfully")
         return session
 
+    def _wait_for_shop_b(self) -> None:
+        """
+        Space out ShopB requests, sleeping only when the previous one was too recent.
+        """
+        with self._shop_b_lock:
+            min_interval = SHOP_B_MIN_INTERVAL
+            if time.monotonic() - self._shop_b_throttled_ts < SHOP_B_THROTTLE_WINDOW:
+                min_interval += random.uniform(1, 3)
+
+            elapsed = time.monotonic() - self._last_shop_b_ts
+            if elapsed < min_interval:
+                delay = min_interval - elapsed
+                logging.debug("Waiting %.2f seconds before ShopB request...", delay)
+                time.sleep(delay)
+            self._last_shop_b_ts = time.monotonic()
+
     def calculate_price_difference(self, price: float, shop_b_price: float) -> float:
         """
         Calculate percentage difference between two prices.
@@ -91,7 +198,7 @@ class PriceStockManager:
             # Round up to 2 decimal places
             return math.ceil(diff * 100) / 100
         except Exception as e:
-            logging.error(f"Error calculating price difference: {str(e)}")
+            logging.error("Error calculating price difference: %s", e)
             return None
 
     def send_out_of_stock_summary(self, out_of_stock_products: list) -> None:
@@ -99,7 +206,7 @@ class PriceStockManager:
         Send a summary notification for out-of-stock products.
         """
         if len(out_of_stock_products) >= 8:
-            logging.info(f"Preparing out-of-stock summary for {len(out_of_stock_products)} products")
+            logging.info("Preparing out-of-stock summary for %s products", len(out_of_stock_products))
 
             # Group products by category
             category_products = {}
@@ -108,21 +215,195 @@ class PriceStockManager:
                     category_products[category] = []
                 category_products[category].append((product_id, title, name))
 
-            # Create message for each category group
+            # Build one message section per category
+            category_sections = {}
             for category, products in category_products.items():
-                message = (
+                section = (
                     f"⚠️ <b>Out-of-Stock Alert - {category}</b> ⚠️\n\n"
                     f"<b>{len(products)} products are out of stock:</b>\n\n"
                 )
 
                 for i, (product_id, title, name) in enumerate(products, 1):
-                    message += (
+                    section += (
                         f"<b>{i}. Product Name (ID: {product_id}):</b>\n"
                         f"{name}\n\n"
                     )
 
-                self.telegram.send_out_of_stock_message(message, [category])
-                logging.info(f"Sent out-of-stock summary notification for category {category}")
+                category_sections[category] = section
+
+            # Send each recipient a single message covering all of their categories
+            self.telegram.send_category_sections(category_sections)
+            logging.info("Sent out-of-stock summary for %s categories", len(category_sections))
+
+    def _process_row(
+        self,
+        index: int,
+        row: Tuple[str, ...],
+        columns: Dict[str, int],
+        total_products: int,
+        shop_b_executor: ThreadPoolExecutor
+    ) -> Tuple[
+        List[Tuple[int, int, str]], int, Optional[Tuple[str, str, str, str]], Optional[Tuple[str, str, str]]
+    ]:
+        """
+        Scrape ShopA/ShopB for a single sheet row.
+
+        Runs on a worker thread, so it only returns results and never touches
+        shared state or sends notifications itself. The ShopB page is fetched
+        on shop_b_executor while ShopA is fetched here, so both overlap.
+
+        Args:
+            index (int): Sheet row number of the product.
+            row (Tuple[str, ...]): Row values in READ_COLUMNS + WRITE_COLUMNS order.
+            columns (Dict[str, int]): Header name to 1-based column index.
+            total_products (int): Number of products, for progress logging.
+            shop_b_executor (ThreadPoolExecutor): Pool used for the ShopB fetch.
+
+        Returns:
+            (cell_updates, unchanged, out_of_stock_entry, alert):
+                cell_updates: (row, col, value) updates for values that changed.
+                unchanged: Number of scraped values equal to what the sheet holds.
+                out_of_stock_entry: (product_id, title, name, category) or None.
+                alert: (product_id, message, category) for a price difference alert or None.
+        """
+        logging.info("Processing product %s/%s", index - 1, total_products)
+
+        cell_updates = []
+        unchanged = 0
+        out_of_stock_entry = None
+        alert = None
+
+        (product_id, category, shop_b_link, product_title, product_persian_name,
+         previous_shop_b_price, previous_shop_a_price, previous_stock) = row
+
+        if not product_id or not category:
+            logging.warning("Skipping row %s: Missing product ShopA_ID or category", index)
+            return cell_updates, unchanged, out_of_stock_entry, alert
+
+        current_shop_b_price = None
+        current_shop_a_price = None
+        current_stock = None
+
+        shop_b_future = None
+        if shop_b_link and shop_b_link != '-':
+            logging.debug("Processing ShopB data for product %s", product_id)
+            shop_b_future = shop_b_executor.submit(
+                extract_price_from_shopB, self.session, shop_b_link
+            )
+
+        try:
+            logging.debug("Processing ShopA data for product %s", product_id)
+            # Always fetch a fresh page for products that were out of stock so restocks are
+            # not missed; ShopA may send no ETag/Last-Modified, so revalidation is not enough
+            with self._shop_a_slots:
+                shop_a_price, shop_a_stock = extract_shopA_info(
+                    self.session, product_id, force_refresh=previous_stock == '0'
+                )
+
+            if shop_a_price is not None:
+                if _needs_update(previous_shop_a_price, shop_a_price):
+                    cell_updates.append((index, columns['ShopA_Price'], str(shop_a_price)))
+                else:
+                    unchanged += 1
+                current_shop_a_price = shop_a_price
+                logging.debug("Product %s: ShopA price = %s", product_id, shop_a_price)
+
+            if shop_a_stock is not None:
+                if _needs_update(previous_stock, shop_a_stock):
+                    cell_updates.append((index, columns['ShopA_Stock'], str(shop_a_stock)))
+                else:
+                    unchanged += 1
+                current_stock = shop_a_stock
+                logging.debug("Product %s: Stock = %s", product_id, shop_a_stock)
+
+                if shop_a_stock == 0:
+                    out_of_stock_entry = (product_id, product_title, product_persian_name, category)
+                    logging.info("Product %s is out of stock", product_id)
+
+        except Exception as e:
+            logging.error("Error processing ShopA for product %s: %s", product_id, e)
+
+        if shop_b_future is not None:
+            try:
+                shop_b_price = shop_b_future.result()
+                if shop_b_price is not None:
+                    if _needs_update(previous_shop_b_price, shop_b_price):
+                        cell_updates.append((index, columns['ShopB_Price'], str(shop_b_price)))
+                    else:
+                        unchanged += 1
+                    current_shop_b_price = shop_b_price
+                    logging.debug("Product %s: ShopB price = %s", product_id, shop_b_price)
+            except Exception as e:
+                if (isinstance(e, requests.HTTPError) and
+                    e.response is not None and
+                    e.response.status_code in (403, 429)):
+                    self._shop_b_throttled_ts = time.monotonic()
+                logging.error("Error processing ShopB for product %s: %s", product_id, e)
+
+        # If both prices and a stock status are available, check for large price differences
+        if (current_shop_a_price is not None and
+            current_shop_b_price is not None and
+            current_stock is not None and
+            current_stock > 0):
+
+            diff_percentage = self.calculate_price_difference(current_shop_a_price, current_shop_b_price)
+            if diff_percentage is not None and abs(diff_percentage) > 5:
+                logging.info("Price difference alert for %s: %s%%", product_id, diff_percentage)
+
+                message = (
+                    f"🔔 <b>Price Difference Alert - {category}</b> 🔔\n\n"
+                    f"📝 <b>Product Name:</b>\n"
+                    f"{product_persian_name}\n"
+                    f"🆔 <b>Product ID:</b> {product_id}\n\n"
+                    f"<b>ShopA Price:</b> {current_shop_a_price:,} Toman\n"
+                    f"<b>ShopB Price:</b> {current_shop_b_price:,} Toman\n"
+                    f"<b>Price Difference:</b> {diff_percentage:+.2f}%\n\n"
+                    f"✅ <b>Status:</b> In Stock\n"
+                )
+                alert = (product_id, message, category)
+
+        return cell_updates, unchanged, out_of_stock_entry, alert
+
+    def _read_products(self, worksheet: gspread.Worksheet) -> Optional[Tuple[Dict[str, int], List[Tuple[str, ...]]]]:
+        """
+        Read the product rows of the worksheet, fetching only the columns in use.
+
+        The cached header mapping is checked against the header cell returned
+        with each column and refreshed once if the sheet layout has changed,
+        so writes never land in a column that has moved.
+
+        Returns:
+            (columns, rows) where rows hold values in READ_COLUMNS + WRITE_COLUMNS order,
+            or None if the sheet is empty or a required column is missing.
+        """
+        for refresh in (False, True):
+            columns = get_header_columns(worksheet, HEADER_CACHE_PATH, refresh)
+            missing = [name for name in READ_COLUMNS + WRITE_COLUMNS if name not in columns]
+            if missing:
+                if not refresh:
+                    continue
+                logging.error("Required column not found: %s", ', '.join(missing))
+                return None
+
+            # Written columns are fetched too so their headers can be verified
+            # and the previous values are available to the scrapers
+            values = sheets_retry(
+                get_columns_values, worksheet,
+                [columns[name] for name in READ_COLUMNS + WRITE_COLUMNS]
+            )
+            if not values or not values[0]:
+                logging.warning("No data found in Sheet2")
+                return None
+
+            headers = tuple(column[0] for column in values)
+            if headers == READ_COLUMNS + WRITE_COLUMNS:
+                logging.info("Successfully retrieved worksheet data")
+                return columns, list(zip(*values))[1:]
+
+            logging.warning("Cached header columns are out of date, refreshing")
+
+        logging.error("Sheet2 headers do not match the expected columns")
+        return None
 
     def update_prices_and_stock(self) -> None:
         """
@@ -131,128 +412,67 @@ class PriceStockManager:
         logging.info("Starting price and stock update process...")
 
         try:
-            worksheet = exponential_retry(lambda: self.sheet.worksheet("Sheet2"))
+            worksheet = sheets_retry(lambda: self.sheet.worksheet("Sheet2"))
             logging.info("Successfully accessed Sheet2")
 
-            all_values = exponential_retry(lambda: worksheet.get_all_values())
-            if not all_values:
-                logging.warning("No data found in Sheet2")
+            data = self._read_products(worksheet)
+            if data is None:
                 return
+            columns, data = data
 
-            headers = all_values[0]
-            logging.info("Successfully retrieved worksheet data")
-
-            # Identify required columns
-            try:
-                shop_b_price_col = headers.index("ShopB_Price") + 1
-                id_col = headers.index("ShopA_ID") + 1
-                price_col = headers.index("ShopA_Price") + 1
-                stock_col = headers.index("ShopA_Stock") + 1
-                category_col = headers.index("Category") + 1
-                shop_b_link_col = headers.index("ShopB_Link") + 1
-                logging.info("Successfully identified all required columns in Sheet2")
-            except ValueError as e:
-                logging.error(f"Required column not found: {str(e)}")
-                return
-
-            data = [dict(zip(headers, row)) for row in all_values[1:]]
             total_products = len(data)
-            logging.info(f"Processing {total_products} products")
+            logging.info("Processing %s products with %s workers", total_products, MAX_WORKERS)
 
             cell_updates = []
+            unchanged_values = 0
             out_of_stock_products = []
+            pending_alerts = []
+
+            # executor.map yields results in row order, so alerts and updates
+            # come out in the same order as the sequential loop produced them.
+            # ShopB fetches get their own pool so row workers never wait on
+            # a pool that is full of row workers; its size is the ShopB concurrency limit
+            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor, \
+                    ThreadPoolExecutor(max_workers=MAX_CONCURRENT_PER_SHOP) as shop_b_executor:
+                results = executor.map(
+                    lambda item: self._process_row(
+                        item[0], item[1], columns, total_products, shop_b_executor
+                    ),
+                    enumerate(data, start=2)
+                )
+                for row_updates, unchanged, out_of_stock_entry, alert in results:
+                    cell_updates.extend(row_updates)
+                    unchanged_values += unchanged
+                    if out_of_stock_entry is not None:
+                        out_of_stock_products.append(out_of_stock_entry)
+                    if alert is not None:
+                        pending_alerts.append(alert)
+
+            scraped_values = len(cell_updates) + unchanged_values
+            if scraped_values:
+                logging.info(
+                    "Skipping %s/%s unchanged values (%.0f%%)",
+                    unchanged_values, scraped_values, 100 * unchanged_values / scraped_values
+                )
 
-            for index, row in enumerate(data, start=2):
-                logging.info(f"Processing product {index - 1}/{total_products}")
-
-                product_id = row.get('ShopA_ID', '')
-                category = row.get('Category', '')
-
-                if not product_id or not category:
-                    logging.warning(f"Skipping row {index}: Missing product ShopA_ID or category")
-                    continue
-
-                current_shop_b_price = None
-                current_shop_a_price = None
-                current_stock = None
-
-                shop_b_link = row.get('ShopB_Link', '')
-                if shop_b_link and shop_b_link != '-':
-                    try:
-                        logging.info(f"Processing ShopB data for product {product_id}")
-                        shop_b_price = extract_price_from_shopB(self.session, shop_b_link)
-                        if shop_b_price is not None:
-                            cell_updates.append((index, shop_b_price_col, str(shop_b_price)))
-                            current_shop_b_price = shop_b_price
-                            logging.info(f"Product {product_id}: ShopB price = {shop_b_price}")
-                    except Exception as e:
-                        logging.error(f"Error processing ShopB for product {product_id}: {str(e)}")
-
-                try:
-                    logging.info(f"Processing ShopA data for product {product_id}")
-                    shop_a_price, shop_a_stock = extract_shopA_info(self.session, product_id)
-
-                    if shop_a_price is not None:
-                        cell_updates.append((index, price_col, str(shop_a_price)))
-                        current_shop_a_price = shop_a_price
-                        logging.info(f"Product {product_id}: ShopA price = {shop_a_price}")
-
-                    if shop_a_stock is not None:
-                        cell_updates.append((index, stock_col, str(shop_a_stock)))
-                        current_stock = shop_a_stock
-                        logging.info(f"Product {product_id}: Stock = {shop_a_stock}")
-
-                        if shop_a_stock == 0:
-                            product_title = row.get('Title', '')
-                            product_persian_name = row.get('Name', '')
-                            out_of_stock_products.append(
-                                (product_id, product_title, product_persian_name, category)
-                            )
-                            logging.info(f"Product {product_id} is out of stock")
-
-                except Exception as e:
-                    logging.error(f"Error processing ShopA for product {product_id}: {str(e)}")
-
-                # If both prices and a stock status are available, check for large price differences
-                if (current_shop_a_price is not None and
-                    current_shop_b_price is not None and
-                    current_stock is not None and
-                    current_stock > 0):
-
-                    diff_percentage = self.calculate_price_difference(current_shop_a_price, current_shop_b_price)
-                    if diff_percentage is not None and abs(diff_percentage) > 5:
-                        product_name = row.get('Title', f'Product ID: {product_id}')
-                        product_persian_name = row.get('Name', '')
-
-                        logging.info(f"Price difference alert for {product_id}: {diff_percentage}%")
-
-                        message = (
-                            f"🔔 <b>Price Difference Alert - {category}</b> 🔔\n\n"
-                            f"📝 <b>Product Name:</b>\n"
-                            f"{product_persian_name}\n"
-                            f"🆔 <b>Product ID:</b> {product_id}\n\n"
-                            f"<b>ShopA Price:</b> {current_shop_a_price:,} Toman\n"
-                            f"<b>ShopB Price:</b> {current_shop_b_price:,} Toman\n"
-                            f"<b>Price Difference:</b> {diff_percentage:+.2f}%\n\n"
-                            f"✅ <b>Status:</b> In Stock\n"
-                        )
-
-                        exponential_retry(lambda: self.telegram.send_message(message, category))
-                        logging.info(f"Sent price difference alert for product {product_id}")
+            # Send price difference alerts once scraping is finished
+            for product_id, message, category in pending_alerts:
+                exponential_retry(lambda: self.telegram.send_message(message, category))
+                logging.info("Sent price difference alert for product %s", product_id)
 
             # Perform batch updates if there are changes
             if cell_updates:
-                logging.info(f"Starting batch updates for {len(cell_updates)} total changes...")
+                logging.info("Starting batch updates for %s total changes...", len(cell_updates))
                 batch_update_cells(worksheet, cell_updates)
                 logging.info("All batch updates completed successfully")
 
             # Send out-of-stock notifications
             if out_of_stock_products:
-                logging.info(f"Found {len(out_of_stock_products)} out-of-stock products")
+                logging.info("Found %s out-of-stock products", len(out_of_stock_products))
                 exponential_retry(lambda: self.send_out_of_stock_summary(out_of_stock_products))
 
             logging.info("Price and stock update process completed successfully")
 
         except Exception as e:
-            logging.error(f"Critical error in update_prices_and_stock: {str(e)}")
+            logging.error("Critical error in update_prices_and_stock: %s", e)
             raise
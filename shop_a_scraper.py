@@ -4,60 +4,87 @@ shop_a_scraper.py
 
 import logging
 from typing import Tuple, Optional
-from bs4 import BeautifulSoup
+from selectolax.lexbor import LexborHTMLParser
 import random
 import time
-import requests
+import requests_cache
 
-from .utils import persian_to_english
+from utils import persian_to_english, read_until
 
+SHOP_A_BASE_URL = 'https://shopa.com/'
 
-def extract_shopA_info(session: requests.Session, product_id: str) -> Tuple[Optional[float], Optional[int]]:
+STREAM_CHUNK_SIZE = 4096
+
+STOCK_SELECTOR = 'b.text-primary'
+PRICE_SELECTOR = 'strong.text-success.font-size-large.font-weight-bold.mt-2'
+
+# Once both elements have been received, the rest of the page is not parsed;
+# pages with different markup never match and are parsed in full
+STOCK_MARKERS = (b'<b class="text-primary">', b'</b>')
+PRICE_MARKERS = (b'<strong class="text-success font-size-large font-weight-bold mt-2">', b'</strong>')
+
+def extract_shopA_info(
+    session: requests_cache.CachedSession,
+    product_id: str,
+    force_refresh: bool = False
+) -> Tuple[Optional[float], Optional[int]]:
     """
     Extract price and stock information from ShopA product page.
 
     Args:
-        session (requests.Session): A requests session with retry logic.
+        session (requests_cache.CachedSession): A cached requests session with retry logic.
         product_id (str): The product identifier from ShopA.
+        force_refresh (bool): Fetch the page from the server even if a cached response exists.
 
     Returns:
         (price, stock):
             price (float): The product price, if found.
             stock (int): 0 if out of stock, 1 if in stock, otherwise None if uncertain.
     """
-    url = f"https://shopa.com/single-product.php?id={product_id}"
-    logging.info(f"Extracting info from ShopA product ID: {product_id}")
+    url = f"{SHOP_A_BASE_URL}single-product.php?id={product_id}"
+    logging.debug("Extracting info from ShopA product ID: %s", product_id)
 
     try:
-        response = session.get(url, timeout=(10, 30), verify=True)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
+        with session.get(url, timeout=(10, 30), verify=True, force_refresh=force_refresh, stream=True) as response:
+            response.raise_for_status()
+            chunks = response.iter_content(STREAM_CHUNK_SIZE)
+            content = read_until(chunks, (STOCK_MARKERS, PRICE_MARKERS))
+            tree = LexborHTMLParser(content)
+
+            stock_text = tree.css_first(STOCK_SELECTOR)
+            price_element = tree.css_first(PRICE_SELECTOR)
+            if not stock_text or not price_element:
+                # Fall back to the full page if the prefix did not contain both elements;
+                # when read_until already consumed the whole body there is nothing to re-parse
+                rest = b''.join(chunks)
+                if rest:
+                    tree = LexborHTMLParser(content + rest)
+                    stock_text = tree.css_first(STOCK_SELECTOR)
+                    price_element = tree.css_first(PRICE_SELECTOR)
 
-        stock_text = soup.find('b', class_='text-primary')
         if not stock_text:
-            logging.warning(f"Stock status not found for ShopA URL: {url}")
+            logging.warning("Stock status not found for ShopA URL: %s", url)
             return None, None
 
-        stock = 0 if 'ناموجود' in stock_text.text else 1
-        logging.info(f"ShopA Stock status: {'Out of Stock' if stock == 0 else 'Available'}")
+        stock: int = 0 if 'ناموجود' in stock_text.text() else 1
+        logging.debug("ShopA Stock status: %s", 'Out of Stock' if stock == 0 else 'Available')
 
-        price_element = soup.find('strong', class_='text-success font-size-large font-weight-bold mt-2')
         if price_element:
-            price_text = price_element.text.strip()
+            price_text = price_element.text().strip()
             if 'تومان' in price_text:
                 price_text = price_text.split('تومان')[0].strip().replace(',', '')
-                price_str = persian_to_english(price_text)
+                price_str: str = persian_to_english(price_text)
                 try:
                     price_float = float(price_str)
-                    logging.info(f"Successfully extracted ShopA price: {price_float}")
+                    logging.debug("Successfully extracted ShopA price: %s", price_float)
                     return price_float, stock
                 except ValueError:
-                    logging.error(f"Error converting price '{price_str}' to float for URL: {url}")
+                    logging.error("Error converting price '%s' to float for URL: %s", price_str, url)
                     return None, stock
 
-        logging.warning(f"Price element not found for ShopA URL: {url}")
+        logging.warning("Price element not found for ShopA URL: %s", url)
         return None, stock
 
     except Exception as e:
-        logging.error(f"Error extracting ShopA info from {url}: {str(e)}")
+        logging.error("Error extracting ShopA info from %s: %s", url, e)
         raise
@@ -4,48 +4,60 @@ shop_b_scraper.py
 
 import logging
 from typing import Optional
-import random
-import time
-import requests
-from bs4 import BeautifulSoup
+import requests_cache
+from selectolax.lexbor import LexborHTMLParser
 
-from .utils import persian_to_english
+from utils import persian_to_english, read_until
 
-def extract_price_from_shopB(session: requests.Session, link: str) -> Optional[float]:
+STREAM_CHUNK_SIZE = 4096
+
+PRICE_SELECTOR = 'div.Showcase_buy_box_text__otYW_'
+
+# The price is the second buy box; it is complete once its currency label has arrived
+BUY_BOX_MARKER = b'<div class="Showcase_buy_box_text__otYW_">'
+PRICE_MARKERS = (BUY_BOX_MARKER, BUY_BOX_MARKER, 'تومان'.encode('utf-8'))
+
+def extract_price_from_shopB(session: requests_cache.CachedSession, link: str) -> Optional[float]:
     """
     Extract price from a ShopB (formerly "Torob") product page.
 
+    Request pacing is left to the caller.
+
     Args:
-        session (requests.Session): A requests session with retry logic.
+        session (requests_cache.CachedSession): A cached requests session with retry logic.
         link (str): The URL of the product page on ShopB.
 
     Returns:
         float: The price if found, else None.
     """
-    logging.info(f"Extracting price from ShopB link: {link}")
+    logging.debug("Extracting price from ShopB link: %s", link)
     try:
-        delay = random.uniform(1, 3)
-        logging.info(f"Waiting {delay:.2f} seconds before ShopB request...")
-        time.sleep(delay)
-
-        response = session.get(link, timeout=(10, 30), verify=True)
-        response.raise_for_status()
-
-        soup = BeautifulSoup(response.content, 'html.parser')
-        price_containers = soup.find_all('div', class_='Showcase_buy_box_text__otYW_')
+        with session.get(link, timeout=(10, 30), verify=True, stream=True) as response:
+            response.raise_for_status()
+            chunks = response.iter_content(STREAM_CHUNK_SIZE)
+            content = read_until(chunks, (PRICE_MARKERS,))
+            tree = LexborHTMLParser(content)
+            price_containers = tree.css(PRICE_SELECTOR)
+            if len(price_containers) < 2:
+                # Fall back to the full page if the prefix did not contain the price;
+                # when read_until already consumed the whole body there is nothing to re-parse
+                rest = b''.join(chunks)
+                if rest:
+                    tree = LexborHTMLParser(content + rest)
+                    price_containers = tree.css(PRICE_SELECTOR)
 
         if len(price_containers) >= 2:
-            price_text = price_containers[1].text
+            price_text = price_containers[1].text()
             if 'تومان' in price_text:
                 price_text = price_text.split('تومان')[0].strip()
                 price_text = ''.join(price_text.split())
-                price_str = persian_to_english(price_text)
-                logging.info(f"Successfully extracted ShopB price: {price_str}")
+                price_str: str = persian_to_english(price_text)
+                logging.debug("Successfully extracted ShopB price: %s", price_str)
                 return float(price_str)
 
-        logging.warning(f"Price element not found for ShopB URL: {link}")
+        logging.warning("Price element not found for ShopB URL: %s", link)
         return None
 
     except Exception as e:
-        logging.error(f"Error extracting ShopB price from {link}: {str(e)}")
+        logging.error("Error extracting ShopB price from %s: %s", link, e)
         raise
@@ -3,10 +3,15 @@ telegram_notifier.py
 """
 
 import logging
-from typing import Dict, List
+from typing import Dict, List, Tuple
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 class TelegramNotificationService:
+    # Telegram rejects messages longer than this many characters
+    MAX_MESSAGE_LENGTH = 4096
+
     def __init__(self, bot_token: str, user_categories: Dict[str, List[str]]):
         """
         Initialize Telegram notifier with user category preferences.
@@ -17,8 +22,60 @@ class TelegramNotificationService:
         """
         self.bot_token = bot_token
         self.user_categories = user_categories
+        self._category_index: Dict[str, List[str]] = {}
+        for chat_id, categories in user_categories.items():
+            for category in categories:
+                self._category_index.setdefault(category, []).append(chat_id)
         self.base_url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-        logging.info(f"Telegram notifier initialized for {len(user_categories)} recipients")
+        self.session = self._create_session()
+        logging.info("Telegram notifier initialized for %s recipients", len(user_categories))
+
+    def _create_session(self) -> requests.Session:
+        """
+        Create a keep-alive session so all notifications reuse one connection.
+        """
+        session = requests.Session()
+
+        retries = Retry(
+            total=5,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=frozenset(['POST'])
+        )
+
+        adapter = HTTPAdapter(
+            max_retries=retries,
+            pool_connections=4,
+            pool_maxsize=8
+        )
+
+        session.mount('https://', adapter)
+        return session
+
+    def _post(self, chat_id: str, text: str) -> bool:
+        """
+        Send a single HTML message to one chat.
+
+        Args:
+            chat_id (str): Recipient chat_id.
+            text (str): Message text.
+
+        Returns:
+            bool: True if the message was sent successfully.
+        """
+        try:
+            payload = {
+                'chat_id': chat_id,
+                'text': text,
+                'parse_mode': 'HTML'
+            }
+            response = self.session.post(self.base_url, json=payload, timeout=10)
+            response.raise_for_status()
+            logging.info("Message sent successfully to chat_id: %s", chat_id)
+            return True
+        except Exception as e:
+            logging.error("Failed to send Telegram message to chat_id %s: %s", chat_id, e)
+            return False
 
     def send_message(self, message: str, category: str) -> bool:
         """
@@ -32,50 +89,89 @@ class TelegramNotificationService:
             bool: True if message was sent successfully to all relevant recipients.
         """
         success = True
-        for chat_id, allowed_categories in self.user_categories.items():
-            if category in allowed_categories:
-                try:
-                    payload = {
-                        'chat_id': chat_id,
-                        'text': message,
-                        'parse_mode': 'HTML'
-                    }
-                    response = requests.post(self.base_url, data=payload)
-                    response.raise_for_status()
-                    logging.info(f"Message for category {category} sent successfully to chat_id: {chat_id}")
-                except Exception as e:
-                    logging.error(f"Failed to send Telegram message to chat_id {chat_id}: {str(e)}")
-                    success = False
+        for chat_id in self._category_index.get(category, ()):
+            if not self._post(chat_id, message):
+                success = False
         return success
 
-    def send_out_of_stock_message(self, message: str, categories: List[str]) -> bool:
+    def send_category_sections(self, category_sections: Dict[str, str]) -> bool:
         """
-        Send out of stock message to users based on their category preferences.
+        Send each user one message combining the sections of all their subscribed categories.
 
         Args:
-            message (str): Message to send.
-            categories (List[str]): List of categories that the out-of-stock products belong to.
+            category_sections (Dict[str, str]): Message section per category.
 
         Returns:
-            bool: True if message was sent successfully to all relevant recipients.
+            bool: True if every message was sent successfully.
         """
         success = True
-        sent_to = set()
-
-        for category in categories:
-            for chat_id, allowed_categories in self.user_categories.items():
-                if category in allowed_categories and chat_id not in sent_to:
-                    try:
-                        payload = {
-                            'chat_id': chat_id,
-                            'text': message,
-                            'parse_mode': 'HTML'
-                        }
-                        response = requests.post(self.base_url, data=payload)
-                        response.raise_for_status()
-                        sent_to.add(chat_id)
-                        logging.info(f"Out of stock message sent successfully to chat_id: {chat_id}")
-                    except Exception as e:
-                        logging.error(f"Failed to send out of stock message to chat_id {chat_id}: {str(e)}")
-                        success = False
+        for chat_id, allowed_categories in self.user_categories.items():
+            sections = [
+                category_sections[category]
+                for category in allowed_categories
+                if category in category_sections
+            ]
+            if not sections:
+                continue
+            for message in self._pack_sections(sections):
+                if not self._post(chat_id, message):
+                    success = False
+            logging.info("Sent %s category sections to chat_id %s", len(sections), chat_id)
         return success
+
+    def _split_to_fit(self, text: str, separators: Tuple[str, ...] = ('\n\n', '\n')) -> List[str]:
+        """
+        Split text into pieces no longer than Telegram's length limit.
+
+        Splits between paragraphs first, then between lines; only a single line
+        longer than the limit is cut at an arbitrary position.
+
+        Args:
+            text (str): Text to split.
+            separators (Tuple[str, ...]): Boundaries to split at, in order of preference.
+
+        Returns:
+            List[str]: Pieces that together hold the whole text.
+        """
+        if len(text) <= self.MAX_MESSAGE_LENGTH:
+            return [text]
+        if not separators:
+            return [
+                text[i:i + self.MAX_MESSAGE_LENGTH]
+                for i in range(0, len(text), self.MAX_MESSAGE_LENGTH)
+            ]
+
+        separator, remaining = separators[0], separators[1:]
+        pieces = []
+        for part in text.split(separator):
+            if part:
+                pieces.extend(self._split_to_fit(part + separator, remaining))
+        return pieces
+
+    def _pack_sections(self, sections: List[str]) -> List[str]:
+        """
+        Join message sections into as few messages as fit Telegram's length limit.
+
+        Sections are only split across messages at their boundaries; a section
+        that is too long on its own is split between its paragraphs or lines.
+
+        Args:
+            sections (List[str]): Message sections in sending order.
+
+        Returns:
+            List[str]: Messages ready to send.
+        """
+        pieces = []
+        for section in sections:
+            pieces.extend(self._split_to_fit(section))
+
+        messages = []
+        current = ''
+        for piece in pieces:
+            if current and len(current) + len(piece) > self.MAX_MESSAGE_LENGTH:
+                messages.append(current)
+                current = ''
+            current += piece
+        if current:
+            messages.append(current)
+        return messages
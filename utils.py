@@ -2,12 +2,58 @@
 utils.py
 """
 
+from typing import Iterator, Sequence
+
+# Persian and Arabic-Indic digits mapped to their ASCII equivalents
+_DIGIT_TRANSLATION = str.maketrans('۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩', '01234567890123456789')
+
+# Every byte that is not an ASCII digit; non-ASCII characters encode to bytes >= 0x80.
+# Deleting these with bytes.translate beats a compiled re.sub(r'[^0-9]+', ...) on price strings.
+_NON_DIGIT_BYTES = bytes(b for b in range(256) if not 0x30 <= b <= 0x39)
+
 def persian_to_english(text: str) -> str:
     """
     Convert Persian digits in text to English digits.
     """
-    persian_digits = '۰۱۲۳۴۵۶۷۸۹'
-    english_digits = '0123456789'
-    translation_table = str.maketrans(persian_digits, english_digits)
-    converted = text.translate(translation_table)
-    return ''.join(c for c in converted if c.isdigit())
+    converted = text.translate(_DIGIT_TRANSLATION)
+    return converted.encode('utf-8').translate(None, _NON_DIGIT_BYTES).decode('ascii')
+
+def read_until(chunks: Iterator[bytes], markers: Sequence[Sequence[bytes]]) -> bytes:
+    """
+    Read a streamed body until every marker sequence has been seen.
+
+    Each sequence is a list of literal byte strings that must appear in order.
+    Every search resumes where the previous one stopped, so the body is scanned
+    only once no matter how many chunks it arrives in.
+
+    Chunks that are not consumed stay in the iterator, so the caller can
+    still read the rest of the body if the prefix turns out to be insufficient.
+
+    Args:
+        chunks (Iterator[bytes]): Body chunks, e.g. from response.iter_content().
+        markers (Sequence[Sequence[bytes]]): Marker sequences that must all be found.
+
+    Returns:
+        bytes: The body read so far (the whole body if some sequence was never completed).
+    """
+    buffer = bytearray()
+    # Per sequence: index of the next marker to find and the offset to search from
+    progress = [[0, 0] for _ in markers]
+
+    for chunk in chunks:
+        buffer += chunk
+        complete = True
+        for sequence, state in zip(markers, progress):
+            while state[0] < len(sequence):
+                marker = sequence[state[0]]
+                position = buffer.find(marker, state[1])
+                if position == -1:
+                    # Keep an overlap so a marker split across chunks is still found
+                    state[1] = max(state[1], len(buffer) - len(marker) + 1)
+                    complete = False
+                    break
+                state[0] += 1
+                state[1] = position + len(marker)
+        if complete:
+            break
+    return bytes(buffer)